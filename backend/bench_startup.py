@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Compare worker startup cost: CSV loaders (pandas) vs prebuilt serving data
+
+Each mode runs in a fresh interpreter under `python -X importtime`, imports
+main and loads every dataset the endpoints serve (what a recycled gunicorn
+worker pays before answering its first requests). Reports total import time
+from -X importtime, wall time to ready, and peak RSS.
+
+Usage:
+    python build_data.py          # make sure the prebuilt data exists first
+    python bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.get_historical_courses()
+main.generate_ongoing_data()
+main.get_stage_transitions_data()
+ready = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print("@@" + json.dumps({
+    "import_main_s": imported - start,
+    "ready_s": ready - start,
+    "peak_rss_mb": rss_mb,
+    "pandas": "pandas" in sys.modules,
+    "numpy": "numpy" in sys.modules,
+}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """Return (total seconds, {top-level module: seconds}) from -X importtime output"""
+    top = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Nested imports are indented under their parent; count top-level only
+        if name.startswith(" ") and not name.startswith("  "):
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative) / 1e6
+    return sum(top.values()), top
+
+
+def run_mode(env_overrides: dict):
+    env = {**os.environ, **env_overrides}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("@@"):
+            result = json.loads(line[2:])
+    if proc.returncode != 0 or result is None:
+        raise RuntimeError(f"child failed:\n{proc.stderr[-2000:]}")
+    result["importtime_s"], result["top"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    import prebuilt
+    if not os.path.exists(prebuilt.serving_data_path()):
+        sys.exit(f"{prebuilt.serving_data_path()} not found; run build_data.py first")
+
+    modes = {
+        "csv (pandas)": {prebuilt.SERVING_DATA_ENV: os.path.join(BACKEND_DIR, "does-not-exist.json")},
+        "prebuilt": {},
+    }
+    print(f"{'mode':<14}{'importtime':>12}{'import main':>13}{'ready':>9}{'peak RSS':>11}  pandas numpy")
+    for name, env in modes.items():
+        runs = [run_mode(env) for _ in range(args.runs)]
+        med = lambda key: statistics.median(r[key] for r in runs)
+        last = runs[-1]
+        print(f"{name:<14}{med('importtime_s') * 1000:>10.0f}ms{med('import_main_s') * 1000:>11.0f}ms"
+              f"{med('ready_s') * 1000:>7.0f}ms{med('peak_rss_mb'):>8.1f} MB  {str(last['pandas']):<7}{last['numpy']}")
+        heaviest = sorted(last["top"].items(), key=lambda kv: kv[1], reverse=True)[:5]
+        print("    heaviest imports: " + ", ".join(f"{m} {s * 1000:.0f}ms" for m, s in heaviest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Offline build step: run the pandas loaders and write the prebuilt serving data
+
+Usage:
+    python build_data.py              # writes ../data/build/serving_data.json
+    python build_data.py --out PATH   # or $SERVING_DATA_PATH
+"""
+import argparse
+import logging
+import sys
+import time
+
+import loaders
+from prebuilt import serving_data_path, write_serving_data
+
+
+def build(out_path: str = None) -> str:
+    start = time.perf_counter()
+
+    historical = loaders.load_historical_data_from_csv()
+    ongoing, transitions = loaders.load_stage_data()
+
+    if not historical or not ongoing:
+        raise RuntimeError(f"Refusing to write empty serving data "
+                           f"(historical={len(historical)}, ongoing={len(ongoing)})")
+
+    path = write_serving_data({
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "historical": [c.model_dump() for c in historical],
+        "ongoing": [c.model_dump() for c in ongoing],
+        "stage_transitions": transitions,
+    }, out_path)
+
+    print(f"Wrote {path}: {len(historical)} historical, {len(ongoing)} ongoing courses "
+          f"in {time.perf_counter() - start:.2f}s")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=None, help=f"output path (default: {serving_data_path()})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    try:
+        build(args.out)
+    except Exception as e:
+        print(f"Build failed: {e}", file=sys.stderr)
+        sys.exit(1)
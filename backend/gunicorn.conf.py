@@ -27,6 +27,15 @@ preload_app = True
 # Worker recycling
 worker_tmp_dir = "/dev/shm"  # Use tmpfs for worker heartbeat
 
+# Metrics - workers share /metrics values through this directory (see metrics.py)
+# Set before the app is preloaded so metrics.py picks it up
+os.environ.setdefault("METRICS_MULTIPROC_DIR", "/dev/shm/mooc-metrics")
+
+def on_starting(server):
+    # Drop values from a previous run; pids are not unique across restarts
+    import metrics
+    metrics.clear_multiprocess_dir()
+
 
 
 
@@ -0,0 +1,359 @@
+"""Batch CQS inference for ongoing courses
+
+Scores whole stage frames with vectorized NumPy using a model exported to a
+local JSON file, and fills CQS_num_pred, CQS_label_pred and
+CQS_confidence_pred (probability of the predicted class).
+
+Model file format (JSON):
+    {
+      "type": "linear" | "tree_ensemble",
+      "features": ["comments_total", ...],      # input columns, in order
+      "classes": [0, 1, 2],                     # CQS code of each output column
+      "fill_values": [0.0, ...],                # optional, used for missing/NaN inputs
+      "scaler": {"mean": [...], "scale": [...]},  # optional standardization
+
+      # type == "linear" (multinomial logistic regression)
+      "coef": [[...], ...],                     # n_classes x n_features (1 x n_features if binary)
+      "intercept": [...],
+
+      # type == "tree_ensemble" (decision tree / random forest, probabilities averaged)
+      "trees": [{"children_left": [...], "children_right": [...],
+                 "feature": [...], "threshold": [...], "value": [[...], ...]}, ...]
+    }
+
+Leaves are nodes whose children_left is -1, as in scikit-learn's tree_ arrays.
+Node 0 is the root; other nodes may be numbered in any order, but every node
+must be reachable from the root exactly once (invalid trees raise ValueError).
+classes must be distinct CQS codes, and coef/value/fill_values/scaler must
+match the number of classes and features; CQSModel raises ValueError otherwise.
+Use export_sklearn_model() to write a file from a fitted scikit-learn model.
+
+Usage:
+    python inference.py score model.json stage.csv scored.csv
+    python inference.py benchmark --rows 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model_path import DEFAULT_MODEL_PATH, MODEL_PATH_ENV, model_path
+from stage_transitions import CQS_LABELS
+
+# Rows scored per batch; small enough that per-level tree traversal arrays
+# stay cache resident (~1.5x faster than 200k on the 1M-row benchmark)
+DEFAULT_BATCH_SIZE = 20_000
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+class _Tree:
+    """One decision tree stored as flat node arrays"""
+
+    def __init__(self, spec: dict):
+        left = np.asarray(spec["children_left"], dtype=np.int64)
+        right = np.asarray(spec["children_right"], dtype=np.int64)
+        feature = np.asarray(spec["feature"], dtype=np.int64)
+        threshold = np.asarray(spec["threshold"], dtype=np.float64)
+        value = np.asarray(spec["value"], dtype=np.float64)
+        if not len(left) == len(right) == len(feature) == len(threshold) == len(value):
+            raise ValueError("tree node arrays have different lengths")
+        if value.ndim != 2:
+            raise ValueError(f"tree value must be n_nodes x n_classes, got shape {value.shape}")
+        # Class counts or fractions -> probabilities
+        totals = value.sum(axis=1, keepdims=True)
+        self.proba = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+
+        # Leaves point back at themselves so traversal needs no leaf mask:
+        # once a row reaches a leaf it stays there for the remaining levels
+        is_leaf = left < 0
+        nodes = np.arange(len(left))
+        self.left = np.where(is_leaf, nodes, left)
+        self.right = np.where(is_leaf, nodes, right)
+        self.feature = np.where(is_leaf, 0, feature)
+        self.threshold = np.where(is_leaf, np.inf, threshold)
+        self.depth = self._max_depth(is_leaf)
+
+    def _max_depth(self, is_leaf: np.ndarray) -> int:
+        """Depth of the deepest leaf, walking the tree from the root (node 0).
+
+        Does not assume any node numbering. Raises ValueError if a child index
+        is out of range or a node is reachable twice (not a tree).
+        """
+        n_nodes = len(self.left)
+        depth = np.full(n_nodes, -1, dtype=np.int64)
+        depth[0] = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if is_leaf[node]:
+                continue
+            for child in (int(self.left[node]), int(self.right[node])):
+                if not 0 <= child < n_nodes:
+                    raise ValueError(f"node {node} has child {child} outside [0, {n_nodes})")
+                if depth[child] != -1:
+                    raise ValueError(f"node {child} is reachable more than once")
+                depth[child] = depth[node] + 1
+                stack.append(child)
+        return int(depth.max())
+
+    def leaves(self, X_flat: np.ndarray, n_rows: int) -> np.ndarray:
+        """Return the leaf index reached by every row.
+
+        X_flat is the feature matrix raveled in column-major order, so the
+        value of feature f for row i is X_flat[f * n_rows + i].
+        """
+        rows = np.arange(n_rows)
+        node = np.zeros(n_rows, dtype=np.int64)
+        for _ in range(self.depth):
+            x = X_flat[self.feature[node] * n_rows + rows]
+            node = np.where(x <= self.threshold[node], self.left[node], self.right[node])
+        return node
+
+
+class CQSModel:
+    """Exported CQS classifier scored with NumPy only"""
+
+    def __init__(self, spec: dict):
+        self.type = spec["type"]
+        self.features: List[str] = list(spec["features"])
+        n_features = len(self.features)
+
+        # Validate shapes up front: a bad file must fail here (so callers fall
+        # back to the CSV predictions), not later while scoring
+        self.classes = np.asarray(spec.get("classes", list(range(len(CQS_LABELS)))), dtype=np.int64)
+        n_classes = len(self.classes)
+        if (self.classes.ndim != 1 or n_classes < 2 or len(np.unique(self.classes)) != n_classes
+                or not np.isin(self.classes, np.arange(len(CQS_LABELS))).all()):
+            raise ValueError(f"classes must be distinct CQS codes in 0..{len(CQS_LABELS) - 1}, "
+                             f"got {self.classes.tolist()}")
+
+        self.fill_values = np.asarray(spec.get("fill_values", [0.0] * n_features), dtype=np.float64)
+        if self.fill_values.shape != (n_features,):
+            raise ValueError(f"fill_values has {self.fill_values.size} entries, expected {n_features}")
+
+        scaler = spec.get("scaler")
+        self.mean = np.asarray(scaler["mean"], dtype=np.float64) if scaler else None
+        self.scale = np.asarray(scaler["scale"], dtype=np.float64) if scaler else None
+        if scaler and (self.mean.shape != (n_features,) or self.scale.shape != (n_features,)):
+            raise ValueError(f"scaler mean/scale have {self.mean.size}/{self.scale.size} entries, "
+                             f"expected {n_features}")
+
+        if self.type == "linear":
+            self.coef = np.asarray(spec["coef"], dtype=np.float64)
+            self.intercept = np.asarray(spec["intercept"], dtype=np.float64)
+            if self.coef.ndim != 2 or self.coef.shape[1] != n_features:
+                raise ValueError(f"coef has shape {self.coef.shape}, expected {n_features} feature columns")
+            # One row per class, or a single logit row for a binary model
+            expected_rows = 1 if n_classes == 2 and len(self.coef) == 1 else n_classes
+            if len(self.coef) != expected_rows:
+                raise ValueError(f"coef has {len(self.coef)} rows, expected {n_classes} classes")
+            if self.intercept.shape != (expected_rows,):
+                raise ValueError(f"intercept has {self.intercept.size} entries, expected {expected_rows}")
+        elif self.type == "tree_ensemble":
+            self.trees = [_Tree(t) for t in spec["trees"]]
+            if not self.trees:
+                raise ValueError("tree_ensemble model has no trees")
+            for k, tree in enumerate(self.trees):
+                if tree.proba.shape[1] != n_classes:
+                    raise ValueError(f"tree {k} value has {tree.proba.shape[1]} columns, expected {n_classes} classes")
+                if ((tree.feature < 0) | (tree.feature >= n_features)).any():
+                    raise ValueError(f"tree {k} splits on a feature index outside [0, {n_features})")
+        else:
+            raise ValueError(f"Unknown model type: {self.type}")
+
+    @classmethod
+    def load(cls, path: str) -> "CQSModel":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def feature_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """Build the float64 input matrix from a frame; missing columns and NaN use fill_values"""
+        X = np.empty((len(df), len(self.features)), dtype=np.float64)
+        for j, col in enumerate(self.features):
+            if col in df.columns:
+                X[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                X[:, j] = np.nan
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self.fill_values, X.shape)[missing]
+        return X
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities, one column per entry of self.classes"""
+        if self.mean is not None:
+            X = (X - self.mean) / self.scale
+
+        if self.type == "linear":
+            z = X @ self.coef.T + self.intercept
+            if z.shape[1] == 1:
+                # Binary logistic regression: the single logit is for classes[1]
+                z = np.hstack([np.zeros_like(z), z])
+            return _softmax(z)
+
+        X_flat = np.ravel(X, order="F")
+        proba = np.zeros((len(X), len(self.classes)), dtype=np.float64)
+        for tree in self.trees:
+            proba += tree.proba[tree.leaves(X_flat, len(X))]
+        proba /= len(self.trees)
+        return proba
+
+    def predict(self, df: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Return (CQS codes, confidence) arrays for every row of df"""
+        codes = np.empty(len(df), dtype=np.int64)
+        confidence = np.empty(len(df), dtype=np.float64)
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            proba = self.predict_proba(self.feature_matrix(batch))
+            best = proba.argmax(axis=1)
+            codes[start:start + len(batch)] = self.classes[best]
+            confidence[start:start + len(batch)] = proba[np.arange(len(batch)), best]
+        return codes, confidence
+
+
+def score_frame(model: CQSModel, df: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+    """Return a copy of df with CQS_num_pred, CQS_label_pred and CQS_confidence_pred filled"""
+    codes, confidence = model.predict(df, batch_size)
+    df = df.copy()
+    df["CQS_num_pred"] = codes
+    df["CQS_label_pred"] = np.asarray(CQS_LABELS, dtype=object)[codes]
+    df["CQS_confidence_pred"] = confidence
+    return df
+
+
+def load_model(path: Optional[str] = None) -> Optional[CQSModel]:
+    """Load the model from path, $CQS_MODEL_PATH or models/cqs_model.json.
+
+    Returns None when no model file exists, so callers keep the predictions
+    already present in the CSVs.
+    """
+    path = model_path(path)
+    if not os.path.exists(path):
+        return None
+    return CQSModel.load(path)
+
+
+def export_sklearn_model(estimator, features: List[str], path: str, scaler=None, fill_values=None):
+    """Write a fitted scikit-learn model to the JSON format above.
+
+    Supports LogisticRegression, DecisionTreeClassifier and forests of them
+    (RandomForestClassifier, ExtraTreesClassifier). scaler is an optional
+    fitted StandardScaler applied before the estimator.
+    """
+    spec = {
+        "features": list(features),
+        "classes": [int(c) for c in estimator.classes_],
+    }
+    if fill_values is not None:
+        spec["fill_values"] = [float(v) for v in fill_values]
+    if scaler is not None:
+        spec["scaler"] = {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
+
+    if hasattr(estimator, "coef_"):
+        spec["type"] = "linear"
+        spec["coef"] = estimator.coef_.tolist()
+        spec["intercept"] = estimator.intercept_.tolist()
+    else:
+        trees = getattr(estimator, "estimators_", [estimator])
+        spec["type"] = "tree_ensemble"
+        spec["trees"] = [
+            {
+                "children_left": t.tree_.children_left.tolist(),
+                "children_right": t.tree_.children_right.tolist(),
+                "feature": t.tree_.feature.tolist(),
+                "threshold": t.tree_.threshold.tolist(),
+                "value": t.tree_.value[:, 0, :].tolist(),
+            }
+            for t in trees
+        ]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+
+
+def _random_tree(rng: np.random.Generator, n_features: int, depth: int, n_classes: int) -> dict:
+    """Complete binary tree of the given depth with random splits, for benchmarking"""
+    n_internal = 2 ** depth - 1
+    n_nodes = 2 ** (depth + 1) - 1
+    idx = np.arange(n_nodes)
+    internal = idx < n_internal
+    return {
+        "children_left": np.where(internal, 2 * idx + 1, -1).tolist(),
+        "children_right": np.where(internal, 2 * idx + 2, -1).tolist(),
+        "feature": np.where(internal, rng.integers(0, n_features, n_nodes), -2).tolist(),
+        "threshold": np.where(internal, rng.random(n_nodes), -2.0).tolist(),
+        "value": rng.integers(1, 50, (n_nodes, n_classes)).tolist(),
+    }
+
+
+def benchmark(rows: int, n_trees: int = 100, depth: int = 8, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Time score_frame on `rows` synthetic courses with a linear and a tree model"""
+    rng = np.random.default_rng(42)
+    features = ["neg_count", "pos_count", "comments_total", "commenters_total", "views_total",
+                "enrollment_count", "inactive_rate", "progress_ratio", "assignment_coverage",
+                "video_coverage", "discussion_coverage", "correct_rate_course"]
+    n_classes = len(CQS_LABELS)
+    df = pd.DataFrame(rng.random((rows, len(features))), columns=features)
+
+    models = {
+        "linear": CQSModel({
+            "type": "linear", "features": features,
+            "coef": rng.normal(size=(n_classes, len(features))).tolist(),
+            "intercept": rng.normal(size=n_classes).tolist(),
+        }),
+        f"forest ({n_trees} trees, depth {depth})": CQSModel({
+            "type": "tree_ensemble", "features": features,
+            "trees": [_random_tree(rng, len(features), depth, n_classes) for _ in range(n_trees)],
+        }),
+    }
+    for name, model in models.items():
+        start = time.perf_counter()
+        scored = score_frame(model, df, batch_size)
+        elapsed = time.perf_counter() - start
+        counts = scored["CQS_label_pred"].value_counts().to_dict()
+        print(f"{name}: {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)  {counts}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    score = sub.add_parser("score", help="score a stage CSV and write the result")
+    score.add_argument("model")
+    score.add_argument("input")
+    score.add_argument("output")
+
+    bench = sub.add_parser("benchmark", help="time scoring on synthetic data")
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    bench.add_argument("--trees", type=int, default=100)
+    bench.add_argument("--depth", type=int, default=8)
+    bench.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+    if args.command == "benchmark":
+        benchmark(args.rows, args.trees, args.depth, args.batch_size)
+    else:
+        model = CQSModel.load(args.model)
+        scored = score_frame(model, pd.read_csv(args.input, low_memory=False))
+        # Write through a temp file so input and output may be the same path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(args.output)), suffix=".csv.tmp")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            scored.to_csv(f, index=False)
+        os.replace(tmp_path, args.output)
+        print(f"Scored {len(scored)} rows -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
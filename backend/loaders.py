@@ -0,0 +1,530 @@
+"""CSV loaders for historical and ongoing course data
+
+These read the CSVs with pandas and are used by the offline build step
+(build_data.py) and by the server when no prebuilt serving data exists.
+Results are not cached here; callers cache them.
+"""
+from typing import List
+import logging
+import random
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+from models import HistoricalCourse, StageData, OngoingCourse
+from stage_transitions import build_stage_transitions
+import inference
+from metrics import PhaseTimer
+
+logger = logging.getLogger(__name__)
+
+def load_historical_data_from_csv() -> List[HistoricalCourse]:
+    """Load historical data from CSV file"""
+    try:
+        # Get the path to the CSV file - try train_set_with_name_score.csv first, then historical_courses.csv
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        csv_paths = [
+            os.path.join(current_dir, "..", "data", "train_set_with_name_score.csv"),
+            os.path.join(current_dir, "..", "data", "historical_courses.csv")
+        ]
+        
+        csv_path = None
+        for path in csv_paths:
+            if os.path.exists(path):
+                csv_path = path
+                break
+        
+        if csv_path is None:
+            logger.warning("CSV file not found. Tried: %s", csv_paths)
+            return []
+        
+        logger.info("Reading CSV from: %s", csv_path)
+        
+        # Read CSV file
+        timer = PhaseTimer("historical")
+        df = pd.read_csv(csv_path)
+        timer.mark("read_csv")
+        logger.info("Loaded CSV with %d rows and %d columns", len(df), len(df.columns))
+        logger.debug("Columns: %s", list(df.columns))
+        
+        # Helper function to safely get value from pandas Series
+        def safe_get(row, col, default=None):
+            if col in df.columns:
+                value = row[col]
+                return value if pd.notna(value) else default
+            return default
+        
+        # Calculate learning_interaction_score if not present
+        if 'learning_interaction_score' not in df.columns:
+            logger.warning("learning_interaction_score not found. Calculating from available data...")
+            
+            # Normalize n_users_content_interaction to [0, 1] first
+            n_users_col = 'n_users_content_interaction'
+            if n_users_col in df.columns:
+                n_users_values = df[n_users_col].fillna(0)
+                n_users_min = n_users_values.min()
+                n_users_max = n_users_values.max()
+                logger.info("Normalizing n_users_content_interaction: min=%s, max=%s", n_users_min, n_users_max)
+                
+                def normalize_n_users(value):
+                    if pd.isna(value) or value is None:
+                        return 0.0
+                    value = float(value)
+                    if n_users_max == n_users_min:
+                        return 0.5 if value > 0 else 0.0
+                    return (value - n_users_min) / (n_users_max - n_users_min)
+            else:
+                def normalize_n_users(value):
+                    return 0.0
+            
+            # Calculate learning_interaction_score from the specified variables
+            def calculate_interaction_score(row):
+                # Get all required variables with safe handling of NaN/None
+                def safe_float_get(col, default=0.0):
+                    val = safe_get(row, col, default)
+                    if val is None or pd.isna(val):
+                        return default
+                    try:
+                        return float(val)
+                    except (ValueError, TypeError):
+                        return default
+                
+                assignment_coverage = safe_float_get('assignment_coverage', 0.0)
+                video_coverage = safe_float_get('video_coverage', 0.0)
+                discussion_coverage = safe_float_get('discussion_coverage', 0.0)
+                n_users_raw = safe_float_get('n_users_content_interaction', 0.0)
+                correct_rate = safe_float_get('correct_rate_course', 0.0)
+                progress_ratio = safe_float_get('progress_ratio', 0.0)
+                
+                # Normalize n_users_content_interaction to [0, 1]
+                n_users_normalized = normalize_n_users(n_users_raw)
+                
+                # All variables should be in [0, 1] range already (except n_users which we normalized)
+                # Calculate average of all 6 variables
+                variables = [
+                    max(0.0, min(1.0, assignment_coverage)),  # Clamp to [0, 1]
+                    max(0.0, min(1.0, video_coverage)),
+                    max(0.0, min(1.0, discussion_coverage)),
+                    n_users_normalized,  # Already normalized to [0, 1]
+                    max(0.0, min(1.0, correct_rate)),
+                    max(0.0, min(1.0, progress_ratio))
+                ]
+                
+                # Calculate mean
+                score = sum(variables) / len(variables)
+                
+                return max(0.0, min(1.0, score))  # Ensure [0, 1] range
+        
+        # Apply data quality filter
+        logger.info("Total courses before filter: %s", len(df))
+        valid_mask = df.apply(is_valid_course_data, axis=1)
+        df_filtered = df[valid_mask]
+        timer.mark("filter")
+        logger.info("Courses after data quality filter: %s", len(df_filtered))
+        
+        # Convert to list of HistoricalCourse objects
+        courses = []
+        for idx, row in df_filtered.iterrows():
+            try:
+                # Map CQV to course_quality_score (support both column names)
+                if 'CQV' in df.columns:
+                    cqv_value = row['CQV']
+                elif 'course_quality_score' in df.columns:
+                    cqv_value = row['course_quality_score']
+                else:
+                    logger.warning("Neither CQV nor course_quality_score found in CSV columns")
+                    cqv_value = 0.0
+                
+                # Get or calculate learning_interaction_score
+                if 'learning_interaction_score' in df.columns:
+                    learning_score = float(safe_get(row, 'learning_interaction_score', 0.0))
+                else:
+                    learning_score = calculate_interaction_score(row)
+                
+                course = HistoricalCourse(
+                    course_id=str(safe_get(row, 'course_id', '')),
+                    course_name=str(safe_get(row, 'course_name', 'Unknown')),
+                    course_quality_score=float(cqv_value) if pd.notna(cqv_value) else 0.0,
+                    learning_interaction_score=float(learning_score),
+                    CQS=str(safe_get(row, 'CQS', 'Unknown')),
+                    n_users_content_interaction=int(safe_get(row, 'n_users_content_interaction', 0)),
+                    enrollment_count=int(safe_get(row, 'enrollment_count', 0)),
+                    comments_total=int(safe_get(row, 'comments_total', 0)),
+                    views_total=int(safe_get(row, 'views_total', 0)),
+                    pos_count=float(safe_get(row, 'pos_count')) if safe_get(row, 'pos_count') is not None else None,
+                    neg_count=float(safe_get(row, 'neg_count')) if safe_get(row, 'neg_count') is not None else None
+                )
+                courses.append(course)
+            except Exception as e:
+                logger.warning("Error processing row %s: %s", idx, e)
+                continue
+        
+        timer.mark("model_build")
+        logger.info("Successfully loaded %s valid historical courses", len(courses))
+        if len(courses) > 0:
+            logger.info("Sample course: %s, CQV: %s, CQS: %s",
+                        courses[0].course_name, courses[0].course_quality_score, courses[0].CQS)
+        
+        return courses
+    except Exception as e:
+        logger.error("Error loading CSV: %s", e)
+        # Return empty list if file not found
+        return []
+
+def is_valid_course_data(row) -> bool:
+    """Check if course has sufficient data quality for reliable prediction
+    Also filters to reduce total courses to ~1000 and increase Critical ratio
+    """
+    def safe_float(val, default=0.0):
+        try:
+            if pd.isna(val) or val is None:
+                return default
+            return float(val)
+        except:
+            return default
+    
+    def safe_str(val, default=''):
+        try:
+            if pd.isna(val) or val is None:
+                return default
+            return str(val)
+        except:
+            return default
+    
+    # Get key metrics
+    enrollment = safe_float(row.get('enrollment_count', 0))
+    inactive_rate = safe_float(row.get('inactive_rate', 0))
+    progress_ratio = safe_float(row.get('progress_ratio', 0))
+    comments = safe_float(row.get('comments_total', 0))
+    views = safe_float(row.get('views_total', 0))
+    n_users_interaction = safe_float(row.get('n_users_content_interaction', 0))
+    cqs = safe_str(row.get('CQS', ''))
+    
+    # Basic quality criteria (apply to all):
+    # 1. Must have reasonable enrollment (> 0)
+    # 2. Inactive rate should not be 100% (or very close)
+    # 3. Should have some interaction
+    
+    has_enrollment = enrollment > 0
+    not_all_inactive = inactive_rate < 0.999
+    has_some_interaction = (comments > 0 or views > 0 or n_users_interaction > 0 or progress_ratio > 0)
+    
+    basic_valid = has_enrollment and not_all_inactive and has_some_interaction
+    
+    if not basic_valid:
+        return False
+    
+    # Strategy to reach ~1000 courses with higher Critical ratio:
+    # - Keep ALL "Needs Improvement" courses (Critical)
+    # - Keep ALL "Excellent" courses
+    # - Filter HEAVILY on "Acceptable" courses - only keep high-quality ones
+    
+    if "Needs Improvement" in cqs or "needs" in cqs.lower():
+        # Keep ALL Critical courses
+        return True
+    
+    if "Excellent" in cqs or "excellent" in cqs.lower():
+        # Keep ALL Excellent courses
+        strong_enrollment = enrollment >= 1  # Good enrollment
+        strong_activity = inactive_rate <= 0.5 and progress_ratio >= 0.4  # Active learners
+        strong_interaction = (comments >= 15 or views >= 100) and n_users_interaction >= 10  # High engagement
+        
+        conditions_met = sum([strong_enrollment, strong_activity, strong_interaction])
+        
+        # Only keep if meeting at least 2/3 strong criteria
+        return conditions_met >= 2
+        # return True
+    
+    if "Acceptable" in cqs or "acceptable" in cqs.lower():
+        # For Acceptable courses, apply STRICT filtering
+        # Only keep courses with strong engagement metrics
+        
+        # Criteria for keeping Acceptable courses:
+        # Must meet at least 2 of these 3 conditions:
+        # strong_enrollment = enrollment >= 50  # Good enrollment
+        strong_enrollment = enrollment >= 1  # Good enrollment
+        strong_activity = inactive_rate <= 0.5 and progress_ratio >= 0.4  # Active learners
+        strong_interaction = (comments >= 15 or views >= 100) and n_users_interaction >= 20  # High engagement
+        
+        conditions_met = sum([strong_enrollment, strong_activity, strong_interaction])
+        
+        # Only keep if meeting at least 2/3 strong criteria
+        return conditions_met >= 2
+    
+    # Default: keep the course if it passed basic validation
+    return True
+
+@lru_cache(maxsize=1)
+def get_cqs_model():
+    """Load the exported CQS model once ($CQS_MODEL_PATH or models/cqs_model.json), None if absent"""
+    try:
+        return inference.load_model()
+    except Exception as e:
+        logger.error("Error loading CQS model: %s", e)
+        return None
+
+def load_stage_frames():
+    """Read the G1, G2, G3 prediction CSVs. Returns (df_g1, df_g2, df_g3) or None if any is missing"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    base_path = os.path.join(current_dir, "..", "data", "predicted")
+    
+    # File paths for the three prediction stages
+    g1_path = os.path.join(base_path, "course_engagement_by_course_G1_with_predictions.csv")
+    g2_path = os.path.join(base_path, "course_engagement_by_course_G2_with_predictions.csv")
+    g3_path = os.path.join(base_path, "course_engagement_by_course_G3_with_predictions.csv")
+    
+    # Check if files exist
+    if not all(os.path.exists(p) for p in [g1_path, g2_path, g3_path]):
+        logger.warning("Some prediction files not found. G1: %s, G2: %s, G3: %s",
+                       os.path.exists(g1_path), os.path.exists(g2_path), os.path.exists(g3_path))
+        return None
+    
+    # Load all three files
+    timer = PhaseTimer("stage_frames")
+    df_g1 = pd.read_csv(g1_path)
+    df_g2 = pd.read_csv(g2_path)
+    df_g3 = pd.read_csv(g3_path)
+    timer.mark("read_csv")
+    
+    logger.info("Loaded G1: %s courses, G2: %s courses, G3: %s courses", len(df_g1), len(df_g2), len(df_g3))
+    
+    # Re-score with the exported model if one is available, otherwise keep the CSV predictions
+    model = get_cqs_model()
+    if model is not None:
+        df_g1, df_g2, df_g3 = (inference.score_frame(model, df) for df in (df_g1, df_g2, df_g3))
+        timer.mark("score")
+        logger.info("Re-scored stage predictions with %s model (%s features)", model.type, len(model.features))
+    
+    return df_g1, df_g2, df_g3
+
+def load_ongoing_data_from_csv(frames=None) -> List[OngoingCourse]:
+    """Load ongoing prediction data from G1, G2, G3 CSV files
+    
+    frames: (df_g1, df_g2, df_g3) from load_stage_frames(), read here if omitted
+    """
+    try:
+        if frames is None:
+            frames = load_stage_frames()
+        if frames is None:
+            return []
+        df_g1, df_g2, df_g3 = frames
+        
+        # Helper function to get CQS label
+        def get_cqs_label(row, col_label='CQS_label_pred', col_num='CQS_num_pred'):
+            """Get CQS label from prediction"""
+            label = safe_get(row, col_label)
+            num = safe_get(row, col_num)
+            
+            # Try to get from label first
+            if pd.notna(label):
+                return str(label).strip()
+            
+            # Fallback to num
+            if pd.notna(num):
+                num = int(num)
+                if num == 0:
+                    return "Needs Improvement"
+                elif num == 1:
+                    return "Acceptable"
+                elif num == 2:
+                    return "Excellent"
+            
+            return None
+        
+        # Helper function to get confidence of the prediction, if the stage was scored
+        def get_confidence(row, col='CQS_confidence_pred'):
+            value = safe_get(row, col)
+            return float(value) if value is not None else None
+        
+        # Helper function to safely get value
+        def safe_get(row, col, default=None):
+            try:
+                if col in row.index:
+                    value = row[col]
+                    return value if pd.notna(value) else default
+            except (AttributeError, KeyError):
+                pass
+            return default
+        
+        # Get all unique course IDs
+        all_course_ids = list(df_g1['course_id'].unique())
+        
+        # Shuffle and split courses into different stages to simulate real-world
+        # 40% only have G1, 30% have G1+G2, 30% have G1+G2+G3
+        random.seed(42)  # For reproducibility
+        random.shuffle(all_course_ids)
+        
+        total = len(all_course_ids)
+        only_g1_count = int(total * 0.4)
+        upto_g2_count = int(total * 0.3)
+        
+        only_g1_ids = set(all_course_ids[:only_g1_count])
+        upto_g2_ids = set(all_course_ids[only_g1_count:only_g1_count + upto_g2_count])
+        upto_g3_ids = set(all_course_ids[only_g1_count + upto_g2_count:])
+        
+        logger.info("Simulating real-world: %d at G1 only, %d at G2, %d at G3",
+                    len(only_g1_ids), len(upto_g2_ids), len(upto_g3_ids))
+        
+        # Evaluate the data quality filter up front, on the first G1 row of each course
+        timer = PhaseTimer("ongoing")
+        g1_first = df_g1.drop_duplicates('course_id')
+        valid_ids = set(g1_first.loc[g1_first.apply(is_valid_course_data, axis=1), 'course_id'])
+        timer.mark("filter")
+        
+        courses = []
+        filtered_count = 0
+        stages = ["Phase 1", "Phase 2", "Phase 3"]
+        
+        for course_id in all_course_ids:
+            try:
+                # Get data from each stage
+                g1_row = df_g1[df_g1['course_id'] == course_id]
+                g2_row = df_g2[df_g2['course_id'] == course_id]
+                g3_row = df_g3[df_g3['course_id'] == course_id]
+                
+                if g1_row.empty:
+                    continue
+                
+                # Use G1 row for course info
+                row = g1_row.iloc[0]
+                
+                # Filter out courses with poor data quality
+                if course_id not in valid_ids:
+                    filtered_count += 1
+                    continue
+                
+                # Get course name
+                course_name = str(safe_get(row, 'course_name', f'Course {course_id}'))
+                
+                # Get enrollment count
+                enrollment = int(safe_get(row, 'enrollment_count', 0))
+                
+                # Build stage data based on which stage the course has reached
+                stage_data = []
+                
+                # G1 - always available
+                g1_label = get_cqs_label(row)
+                stage_data.append(StageData(
+                    stage="Phase 1",
+                    prediction=g1_label,
+                    confidence=get_confidence(row)
+                ))
+                
+                # G2 - only if course has progressed
+                if course_id in upto_g2_ids or course_id in upto_g3_ids:
+                    if not g2_row.empty:
+                        g2_row_data = g2_row.iloc[0]
+                        g2_label = get_cqs_label(g2_row_data)
+                        stage_data.append(StageData(
+                            stage="Phase 2",
+                            prediction=g2_label,
+                            confidence=get_confidence(g2_row_data)
+                        ))
+                    else:
+                        stage_data.append(StageData(stage="Phase 2", prediction=None, confidence=None))
+                else:
+                    # Course hasn't reached G2 yet
+                    stage_data.append(StageData(stage="Phase 2", prediction=None, confidence=None))
+                
+                # G3 - only if course has progressed further
+                if course_id in upto_g3_ids:
+                    if not g3_row.empty:
+                        g3_row_data = g3_row.iloc[0]
+                        g3_label = get_cqs_label(g3_row_data)
+                        stage_data.append(StageData(
+                            stage="Phase 3",
+                            prediction=g3_label,
+                            confidence=get_confidence(g3_row_data)
+                        ))
+                    else:
+                        stage_data.append(StageData(stage="Phase 3", prediction=None, confidence=None))
+                else:
+                    # Course hasn't reached G3 yet
+                    stage_data.append(StageData(stage="Phase 3", prediction=None, confidence=None))
+                
+                course = OngoingCourse(
+                    id=str(course_id),
+                    name=course_name,
+                    current_students=enrollment,
+                    data=stage_data,
+                    # Additional details from G1 row
+                    num_chapters=int(safe_get(row, 'num_chapters', 0)),
+                    n_videos=int(safe_get(row, 'n_videos', 0)),
+                    n_exercises=int(safe_get(row, 'n_exercises', 0)),
+                    n_problems=int(safe_get(row, 'n_problems', 0)),
+                    n_users_content_interaction=float(safe_get(row, 'n_users_content_interaction', 0)),
+                    assignment_coverage=float(safe_get(row, 'assignment_coverage', 0)),
+                    video_coverage=float(safe_get(row, 'video_coverage', 0)),
+                    discussion_coverage=float(safe_get(row, 'discussion_coverage', 0)),
+                    correct_rate_course=float(safe_get(row, 'correct_rate_course', 0)),
+                    comments_total=int(safe_get(row, 'comments_total', 0)),
+                    commenters_total=int(safe_get(row, 'commenters_total', 0)),
+                    views_total=int(safe_get(row, 'views_total', 0)),
+                    viewers_total=int(safe_get(row, 'viewers_total', 0)),
+                    enrollment_count=int(safe_get(row, 'enrollment_count', 0)),
+                    inactive_rate=float(safe_get(row, 'inactive_rate', 0)),
+                    progress_ratio=float(safe_get(row, 'progress_ratio', 0))
+                )
+                courses.append(course)
+                
+            except Exception as e:
+                logger.warning("Error processing course %s: %s", course_id, e)
+                continue
+        
+        timer.mark("model_build")
+        logger.info("Successfully loaded %s ongoing courses (filtered out %s courses)", len(courses), filtered_count)
+        if len(courses) > 0:
+            sample = courses[0]
+            predictions = [f"{d.stage}: {d.prediction or 'N/A'}" for d in sample.data]
+            logger.info("Sample: %s, Predictions: %s", sample.name, predictions)
+        
+        return courses
+        
+    except Exception as e:
+        logger.error("Error loading ongoing data: %s", e)
+        return []
+
+def load_stage_transitions(frames=None) -> dict:
+    """Compute Phase 1 -> 2 -> 3 transition analytics from the stage CSV files
+    
+    Uses all three stage files for every course (not the simulated progression
+    of /api/ongoing-prediction), restricted to courses passing the data quality filter.
+    frames: (df_g1, df_g2, df_g3) from load_stage_frames(), read here if omitted
+    """
+    try:
+        if frames is None:
+            frames = load_stage_frames()
+        if frames is None:
+            return {}
+        df_g1 = frames[0]
+        
+        # Same data quality filter as the ongoing view, evaluated on the G1 rows
+        timer = PhaseTimer("stage_transitions")
+        valid_mask = df_g1.apply(is_valid_course_data, axis=1)
+        valid_ids = pd.Index(df_g1.loc[valid_mask, 'course_id'])
+        timer.mark("filter")
+        
+        transitions = build_stage_transitions(list(frames), valid_ids)
+        timer.mark("analytics")
+        logger.info("Computed stage transitions for %d courses (%d degrading)",
+                    transitions['total_courses'], len(transitions['degrading_courses']))
+        
+        return transitions
+    except Exception as e:
+        logger.error("Error computing stage transitions: %s", e)
+        return {}
+
+def load_stage_data():
+    """Read (and re-score) the stage CSV files once for both stage consumers
+    
+    Returns (ongoing courses, stage transitions); either is empty on failure.
+    """
+    try:
+        frames = load_stage_frames()
+    except Exception as e:
+        logger.error("Error reading stage files: %s", e)
+        return [], {}
+    if frames is None:
+        return [], {}
+    return load_ongoing_data_from_csv(frames), load_stage_transitions(frames)
@@ -0,0 +1,399 @@
+"""Minimal Prometheus metrics for the API (standard library only)
+
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by render().
+
+With a single server process (uvicorn, as in render.yaml) values live in
+memory. Under gunicorn each scrape reaches whichever worker accepts it, so
+set METRICS_MULTIPROC_DIR (gunicorn.conf.py does) to aggregate across workers:
+every process flushes its values to <dir>/pid_<pid>.json at most every
+FLUSH_INTERVAL seconds and at exit, and render() merges all files.
+
+- Counters and histograms are summed over all processes, including ones that
+  have exited (e.g. recycled by max_requests), so they never go backwards.
+  Files of dead processes are folded into <dir>/archive.json.
+- Gauges are reported per live process with a `pid` label.
+
+Values of other workers can be up to FLUSH_INTERVAL old at scrape time. The
+directory must be emptied when the server starts (see clear_multiprocess_dir).
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# No charset here: Starlette appends "; charset=utf-8" to every text/* response,
+# and Prometheus rejects a Content-Type with the parameter twice
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MULTIPROC_DIR_ENV = "METRICS_MULTIPROC_DIR"
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def values(self) -> Dict[Tuple[str, ...], object]:
+        """Copy of this process's values, keyed by label values"""
+        with self._lock:
+            return {k: list(v) if isinstance(v, list) else v for k, v in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(a, b):
+        """Combine the values of one series from two processes"""
+        return a + b
+
+    def samples(self, values: dict, labelnames: Tuple[str, ...]) -> List[str]:
+        return [f"{self.name}{_format_labels(labelnames, k)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+    def render(self, values: dict, labelnames: Optional[Tuple[str, ...]] = None) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples(values, self.labelnames if labelnames is None else labelnames))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        _changed()
+
+
+class Gauge(_Metric):
+    """Gauge whose value is set explicitly, or computed at scrape time by `callback`"""
+    type = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        _changed()
+
+    def values(self) -> Dict[Tuple[str, ...], object]:
+        if self._callback is not None:
+            value = self._callback()
+            return {} if value is None else {(): value}
+        return super().values()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # values: key -> [cumulative bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+        _changed()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def samples(self, values: dict, labelnames: Tuple[str, ...]) -> List[str]:
+        lines = []
+        for key, state in sorted(values.items()):
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labelnames, key, le)} {_format_value(count)}")
+            labels = _format_labels(labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _MultiprocessStore:
+    """Shares metric values between worker processes through a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.dirty = False
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _pid_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"pid_{pid}.json")
+
+    def mark_dirty(self):
+        self.dirty = True
+        # The flusher thread does not survive fork, so start one per process
+        if self._flusher_pid != os.getpid():
+            with self._flush_lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self.dirty:
+                self.flush()
+
+    def flush(self):
+        """Write this process's counters and histograms (and current gauges) to its pid file"""
+        with self._flush_lock:
+            self.dirty = False
+            pid = os.getpid()
+            data = {m.name: [[list(k), v] for k, v in m.values().items()] for m in _registry}
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._pid_path(pid)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+
+    def after_fork(self):
+        self.dirty = False
+        self._flusher_pid = None
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def collect(self) -> Dict[str, dict]:
+        """Merged values of all processes, as {metric name: {key: value}}"""
+        self.flush()
+        metrics_by_name = {m.name: m for m in _registry}
+        merged: Dict[str, dict] = {m.name: {} for m in _registry}
+
+        def add(name, key, value, pid=None):
+            metric = metrics_by_name.get(name)
+            if metric is None:
+                return
+            if isinstance(metric, Gauge):
+                merged[name][(str(pid),) + key] = value
+            elif key in merged[name]:
+                merged[name][key] = metric.merge(merged[name][key], value)
+            else:
+                merged[name][key] = value
+
+        with open(os.path.join(self.directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                archive_path = os.path.join(self.directory, "archive.json")
+                archive = self._read(archive_path)
+                dead = []
+                for path in glob.glob(os.path.join(self.directory, "pid_*.json")):
+                    pid = int(os.path.basename(path)[len("pid_"):-len(".json")])
+                    data = self._read(path)
+                    if _pid_alive(pid):
+                        for name, series in data.items():
+                            for key, value in series:
+                                add(name, tuple(key), value, pid)
+                    else:
+                        dead.append((path, data))
+
+                if dead:
+                    # Fold exited processes into the archive; their gauges are dropped
+                    totals = {name: {tuple(k): v for k, v in series} for name, series in archive.items()}
+                    for _, data in dead:
+                        for name, series in data.items():
+                            metric = metrics_by_name.get(name)
+                            if metric is None or isinstance(metric, Gauge):
+                                continue
+                            bucket = totals.setdefault(name, {})
+                            for key, value in series:
+                                key = tuple(key)
+                                bucket[key] = metric.merge(bucket[key], value) if key in bucket else value
+                    archive = {name: [[list(k), v] for k, v in series.items()] for name, series in totals.items()}
+                    tmp_path = f"{archive_path}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(archive, f)
+                    os.replace(tmp_path, archive_path)
+                    for path, _ in dead:
+                        os.remove(path)
+
+                for name, series in archive.items():
+                    for key, value in series:
+                        add(name, tuple(key), value)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return merged
+
+
+_store: Optional[_MultiprocessStore] = None
+if os.getenv(MULTIPROC_DIR_ENV):
+    _store = _MultiprocessStore(os.environ[MULTIPROC_DIR_ENV])
+    atexit.register(_store.flush)
+
+
+def _changed():
+    if _store is not None:
+        _store.mark_dirty()
+
+
+def _after_fork_in_child():
+    # Values recorded by the parent before fork belong to the parent
+    for metric in _registry:
+        if not (isinstance(metric, Gauge) and metric._callback is not None):
+            metric.reset()
+    if _store is not None:
+        _store.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def clear_multiprocess_dir(directory: Optional[str] = None):
+    """Remove all files of a previous server run; call once before workers start"""
+    directory = directory or os.getenv(MULTIPROC_DIR_ENV)
+    if directory and os.path.isdir(directory):
+        shutil.rmtree(directory)
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format, aggregated over workers if configured"""
+    if _store is None:
+        return "\n".join(m.render(m.values()) for m in _registry) + "\n"
+    merged = _store.collect()
+    parts = []
+    for m in _registry:
+        labelnames = ("pid",) + m.labelnames if isinstance(m, Gauge) else m.labelnames
+        parts.append(m.render(merged[m.name], labelnames))
+    return "\n".join(parts) + "\n"
+
+
+def current_rss_bytes() -> Optional[float]:
+    """Current resident set size, from /proc on Linux; None where unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return float(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return float(rss) if sys.platform == "darwin" else float(rss) * 1024
+
+
+REQUEST_LATENCY = Histogram(
+    "mooc_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+CACHE_REQUESTS = Counter(
+    "mooc_cache_requests_total", "Data cache lookups by cache and result (hit/miss)",
+    ("cache", "result"),
+)
+LOADER_PHASE = Histogram(
+    "mooc_loader_phase_seconds", "Time spent in each data loading phase",
+    ("loader", "phase"),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+Gauge("process_resident_memory_bytes", "Current resident memory size in bytes", callback=current_rss_bytes)
+Gauge("process_peak_resident_memory_bytes", "Peak resident memory size in bytes", callback=peak_rss_bytes)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def phase(loader: str, name: str):
+    """Context manager timing one loader phase, e.g. `with phase("historical", "read_csv"):`"""
+    return LOADER_PHASE.time(loader=loader, phase=name)
+
+
+class PhaseTimer:
+    """Records consecutive loader phases without re-indenting the loader body
+
+        timer = PhaseTimer("historical")
+        df = pd.read_csv(path)
+        timer.mark("read_csv")      # time since the timer was created
+        df = df[mask]
+        timer.mark("filter")        # time since the previous mark
+    """
+
+    def __init__(self, loader: str):
+        self.loader = loader
+        self._last = time.perf_counter()
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        LOADER_PHASE.observe(now - self._last, loader=self.loader, phase=name)
+        self._last = now
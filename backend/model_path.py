@@ -0,0 +1,15 @@
+"""Location of the exported CQS model file
+
+Kept free of NumPy/pandas imports so prebuilt.py can check the model's
+mtime without loading inference.py into the server process.
+"""
+import os
+from typing import Optional
+
+MODEL_PATH_ENV = "CQS_MODEL_PATH"
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "cqs_model.json")
+
+
+def model_path(path: Optional[str] = None) -> str:
+    """Resolve the model file: path, $CQS_MODEL_PATH or models/cqs_model.json"""
+    return path or os.getenv(MODEL_PATH_ENV) or DEFAULT_MODEL_PATH
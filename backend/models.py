@@ -0,0 +1,44 @@
+"""API data models shared by the server, the CSV loaders and the offline build step"""
+from pydantic import BaseModel
+from typing import List, Optional
+
+class HistoricalCourse(BaseModel):
+    course_id: str
+    course_name: str
+    course_quality_score: float  # Mapped from CQV in CSV
+    learning_interaction_score: float
+    CQS: str
+    n_users_content_interaction: Optional[int] = 0
+    enrollment_count: Optional[int] = 0
+    comments_total: Optional[int] = 0
+    views_total: Optional[int] = 0
+    pos_count: Optional[float] = None
+    neg_count: Optional[float] = None
+
+class StageData(BaseModel):
+    stage: str
+    prediction: Optional[str] = None  # CQS prediction label
+    confidence: Optional[float] = None  # Confidence score if available
+
+class OngoingCourse(BaseModel):
+    id: str
+    name: str
+    current_students: int
+    data: List[StageData]
+    # Additional course details
+    num_chapters: Optional[int] = None
+    n_videos: Optional[int] = None
+    n_exercises: Optional[int] = None
+    n_problems: Optional[int] = None
+    n_users_content_interaction: Optional[float] = None
+    assignment_coverage: Optional[float] = None
+    video_coverage: Optional[float] = None
+    discussion_coverage: Optional[float] = None
+    correct_rate_course: Optional[float] = None
+    comments_total: Optional[int] = None
+    commenters_total: Optional[int] = None
+    views_total: Optional[int] = None
+    viewers_total: Optional[int] = None
+    enrollment_count: Optional[int] = None
+    inactive_rate: Optional[float] = None
+    progress_ratio: Optional[float] = None
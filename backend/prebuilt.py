@@ -0,0 +1,74 @@
+"""Reader and writer for the prebuilt serving data
+
+The offline build step (build_data.py) runs the pandas loaders once and
+writes their output to a single JSON file. The server reads it back with the
+standard library only, so serving never imports pandas or NumPy.
+"""
+import json
+import logging
+import os
+from typing import Optional
+
+from model_path import model_path
+
+logger = logging.getLogger(__name__)
+
+SERVING_DATA_ENV = "SERVING_DATA_PATH"
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+DEFAULT_SERVING_DATA_PATH = os.path.join(DATA_DIR, "build", "serving_data.json")
+
+# Bump when the layout of the serving file changes
+FORMAT_VERSION = 1
+
+# Source files whose modification makes the serving file stale (the CQS
+# model file is checked too, see source_files())
+SOURCE_FILES = [
+    os.path.join(DATA_DIR, "train_set_with_name_score.csv"),
+    os.path.join(DATA_DIR, "historical_courses.csv"),
+    os.path.join(DATA_DIR, "predicted", "course_engagement_by_course_G1_with_predictions.csv"),
+    os.path.join(DATA_DIR, "predicted", "course_engagement_by_course_G2_with_predictions.csv"),
+    os.path.join(DATA_DIR, "predicted", "course_engagement_by_course_G3_with_predictions.csv"),
+]
+
+
+def serving_data_path() -> str:
+    return os.getenv(SERVING_DATA_ENV) or DEFAULT_SERVING_DATA_PATH
+
+
+def source_files() -> list:
+    """SOURCE_FILES plus the CQS model file the loaders re-score with"""
+    return SOURCE_FILES + [model_path()]
+
+
+def write_serving_data(data: dict, path: Optional[str] = None) -> str:
+    """Write the serving payload atomically and return the path"""
+    path = path or serving_data_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"format_version": FORMAT_VERSION, **data}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_serving_data(path: Optional[str] = None) -> Optional[dict]:
+    """Return the prebuilt payload, or None if there is no usable serving file"""
+    path = path or serving_data_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error("Error reading serving data %s: %s", path, e)
+        return None
+    if data.get("format_version") != FORMAT_VERSION:
+        logger.warning("Ignoring serving data %s: format %s, expected %s",
+                       path, data.get('format_version'), FORMAT_VERSION)
+        return None
+
+    built = os.path.getmtime(path)
+    stale = [p for p in source_files() if os.path.exists(p) and os.path.getmtime(p) > built]
+    if stale:
+        logger.warning("Serving data is older than %s; re-run build_data.py", [os.path.basename(p) for p in stale])
+    return data
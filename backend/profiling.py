@@ -0,0 +1,110 @@
+"""Opt-in profiling hooks (set PROFILING_ENABLED=1)
+
+Two artifacts are supported:
+- cProfile (pstats) for a data reload, which runs in a single thread.
+- Sampled stacks for one request. Sync endpoints run in a threadpool, so a
+  background thread samples every thread's stack at a fixed interval while the
+  request is in flight. Output is in collapsed-stack format ("a;b;c count"),
+  readable by flamegraph.pl and speedscope. Samples from concurrent requests
+  are included, so profile on an otherwise idle worker.
+
+Request artifacts are written to PROFILE_DIR (default: a temp directory) and
+fetched with GET /debug/profiles/{name}.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Optional, Tuple
+
+ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "mooc-profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Artifact names we hand out; anything else is rejected by artifact_path()
+_ARTIFACT_NAME = re.compile(r"^[A-Za-z0-9_.-]+\.(folded|prof|txt)$")
+
+
+def run_cprofile(func: Callable[[], object], sort: str = "cumulative", limit: int = 50) -> Tuple[bytes, str]:
+    """Run func under cProfile. Returns (marshalled pstats data, text report)"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        func()
+    finally:
+        profiler.disable()
+
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats(sort).print_stats(limit)
+
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    os.close(fd)
+    try:
+        profiler.dump_stats(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    return data, report.getvalue()
+
+
+class StackSampler:
+    """Samples the stacks of all other threads until stopped"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def save_artifact(content: str, prefix: str, suffix: str = "folded") -> str:
+    """Write a profile artifact and return its name"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{prefix}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.{suffix}"
+    with open(os.path.join(PROFILE_DIR, name), "w", encoding="utf-8") as f:
+        f.write(content)
+    return name
+
+
+def artifact_path(name: str) -> Optional[str]:
+    """Resolve an artifact name to its path, or None if invalid or missing"""
+    if not _ARTIFACT_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
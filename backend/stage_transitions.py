@@ -0,0 +1,234 @@
+"""Stage-transition analytics across the G1 -> G2 -> G3 prediction files
+
+All computations work on the three stage frames joined on course_id, using
+aligned column arithmetic instead of walking courses one at a time.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+STAGES = ["Phase 1", "Phase 2", "Phase 3"]
+STAGE_SUFFIXES = ["_g1", "_g2", "_g3"]
+
+# Ordered from worst to best, index == CQS_num code
+CQS_LABELS = ["Needs Improvement", "Acceptable", "Excellent"]
+CQS_CODES = {label: code for code, label in enumerate(CQS_LABELS)}
+
+# Metrics whose stage-to-stage change is reported
+DELTA_METRICS = [
+    "comments_total",
+    "inactive_rate",
+    "neg_count",
+    "pos_count",
+    "neg_pos_ratio",
+]
+
+# Stage pairs reported in transition matrices and deltas
+STAGE_PAIRS = [(0, 1), (1, 2), (0, 2)]
+
+
+def stage_pair_key(i: int, j: int) -> str:
+    return f"{STAGES[i]} -> {STAGES[j]}"
+
+
+def cqs_codes(df: pd.DataFrame, col_label: str = "CQS_label_pred", col_num: str = "CQS_num_pred") -> pd.Series:
+    """Return the CQS code (0/1/2) per row, preferring the label column
+    and falling back to the numeric prediction. Unknown values become NaN.
+    """
+    codes = pd.Series(np.nan, index=df.index, dtype="float64")
+    if col_label in df.columns:
+        codes = df[col_label].astype("string").str.strip().map(CQS_CODES).astype("float64")
+    if col_num in df.columns:
+        num = pd.to_numeric(df[col_num], errors="coerce")
+        num = num.where(num.isin([0, 1, 2]))
+        codes = codes.fillna(num)
+    return codes
+
+
+def join_stage_frames(frames: List[pd.DataFrame], course_ids: Optional[pd.Index] = None) -> pd.DataFrame:
+    """Join the G1/G2/G3 frames on course_id into one wide frame.
+
+    Only courses present in every stage are kept. Each stage contributes its
+    CQS code and the delta metrics, suffixed with _g1/_g2/_g3.
+    """
+    parts = []
+    for df, suffix in zip(frames, STAGE_SUFFIXES):
+        stage = df.drop_duplicates("course_id").set_index("course_id")
+        cols = pd.DataFrame(index=stage.index)
+        cols["cqs"] = cqs_codes(stage)
+        for metric in ["comments_total", "inactive_rate", "neg_count", "pos_count"]:
+            if metric in stage.columns:
+                cols[metric] = pd.to_numeric(stage[metric], errors="coerce")
+            else:
+                cols[metric] = np.nan
+        # Negative-to-positive sentiment ratio, undefined when there are no positives
+        cols["neg_pos_ratio"] = (cols["neg_count"] / cols["pos_count"]).replace([np.inf, -np.inf], np.nan)
+        parts.append(cols.add_suffix(suffix))
+
+    joined = pd.concat(parts, axis=1, join="inner")
+    if course_ids is not None:
+        joined = joined[joined.index.isin(course_ids)]
+
+    names = None
+    for df in frames:
+        if "course_name" in df.columns:
+            names = df.drop_duplicates("course_id").set_index("course_id")["course_name"]
+            break
+    if names is not None:
+        joined["course_name"] = names.reindex(joined.index)
+    else:
+        joined["course_name"] = np.nan
+    joined["course_name"] = joined["course_name"].fillna(
+        pd.Series("Course " + joined.index.astype(str), index=joined.index)
+    )
+    return joined
+
+
+def transition_matrix(joined: pd.DataFrame, i: int, j: int) -> List[List[int]]:
+    """Count courses moving from each label at stage i to each label at stage j.
+
+    Rows are the label at stage i, columns the label at stage j, both in
+    CQS_LABELS order. Courses without a prediction at either stage are skipped.
+    """
+    src = joined[f"cqs{STAGE_SUFFIXES[i]}"].to_numpy()
+    dst = joined[f"cqs{STAGE_SUFFIXES[j]}"].to_numpy()
+    known = ~(np.isnan(src) | np.isnan(dst))
+    n = len(CQS_LABELS)
+    flat = src[known].astype(np.int64) * n + dst[known].astype(np.int64)
+    return np.bincount(flat, minlength=n * n).reshape(n, n).tolist()
+
+
+def _none_if_nan(value):
+    """Convert a numeric scalar to float, mapping NaN to None for JSON output"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def metric_deltas(joined: pd.DataFrame) -> pd.DataFrame:
+    """Return per-course deltas (later stage minus earlier stage) for every
+    metric in DELTA_METRICS and every stage pair, as <metric>_delta_<i><j>.
+    """
+    deltas = pd.DataFrame(index=joined.index)
+    for i, j in STAGE_PAIRS:
+        for metric in DELTA_METRICS:
+            deltas[f"{metric}_delta_{i + 1}{j + 1}"] = (
+                joined[f"{metric}{STAGE_SUFFIXES[j]}"] - joined[f"{metric}{STAGE_SUFFIXES[i]}"]
+            )
+    return deltas
+
+
+def summarize_deltas(deltas: pd.DataFrame) -> Dict[str, Dict[str, dict]]:
+    """Aggregate per-course deltas into mean/median/min/max per metric and stage pair"""
+    summary: Dict[str, Dict[str, dict]] = {}
+    for metric in DELTA_METRICS:
+        summary[metric] = {}
+        for i, j in STAGE_PAIRS:
+            col = deltas[f"{metric}_delta_{i + 1}{j + 1}"]
+            count = int(col.notna().sum())
+            if count == 0:
+                # All-NaN medians make NumPy warn "Mean of empty slice"
+                summary[metric][stage_pair_key(i, j)] = {
+                    "mean": None, "median": None, "min": None, "max": None, "count": 0,
+                }
+                continue
+            summary[metric][stage_pair_key(i, j)] = {
+                "mean": _none_if_nan(col.mean()),
+                "median": _none_if_nan(col.median()),
+                "min": _none_if_nan(col.min()),
+                "max": _none_if_nan(col.max()),
+                "count": count,
+            }
+    return summary
+
+
+def degrading_courses(joined: pd.DataFrame, deltas: pd.DataFrame) -> List[dict]:
+    """List courses whose predicted CQS drops between consecutive stages.
+
+    A course is degrading if its label at Phase 2 is worse than at Phase 1, or
+    its label at Phase 3 is worse than at Phase 2. Results are sorted by the
+    largest single-step drop, then by the overall Phase 1 -> Phase 3 drop.
+    """
+    codes = joined[[f"cqs{s}" for s in STAGE_SUFFIXES]].to_numpy()
+    # Positive values are drops in quality; NaN when either stage is unknown
+    step_drops = codes[:, :-1] - codes[:, 1:]
+    with np.errstate(invalid="ignore"):
+        worst_step = np.nanmax(np.where(np.isnan(step_drops), -np.inf, step_drops), axis=1)
+    overall_drop = codes[:, 0] - codes[:, -1]
+
+    mask = worst_step > 0
+    if not mask.any():
+        return []
+
+    selected = joined[mask].copy()
+    selected["worst_step_drop"] = worst_step[mask].astype(int)
+    selected["overall_drop"] = overall_drop[mask]
+    selected = selected.sort_values(
+        ["worst_step_drop", "overall_drop"], ascending=False, kind="mergesort", na_position="last"
+    )
+    selected_deltas = deltas.loc[selected.index]
+
+    # Index into the label table; NaN codes point at the trailing None
+    label_table = np.array(CQS_LABELS + [None], dtype=object)
+    label_cols = []
+    for suffix in STAGE_SUFFIXES:
+        col = selected[f"cqs{suffix}"].to_numpy()
+        idx = np.where(np.isnan(col), len(CQS_LABELS), np.nan_to_num(col)).astype(np.int64)
+        label_cols.append(label_table[idx].tolist())
+
+    delta_records = selected_deltas.astype(object).where(selected_deltas.notna(), None).to_dict(orient="records")
+
+    result = []
+    for k, (course_id, course_name, worst, overall) in enumerate(
+        zip(selected.index, selected["course_name"], selected["worst_step_drop"], selected["overall_drop"])
+    ):
+        result.append({
+            "course_id": str(course_id),
+            "course_name": str(course_name),
+            "predictions": {stage: label_cols[s][k] for s, stage in enumerate(STAGES)},
+            "worst_step_drop": int(worst),
+            "overall_drop": _none_if_nan(overall),
+            "deltas": delta_records[k],
+        })
+    return result
+
+
+def build_stage_transitions(frames: List[pd.DataFrame], course_ids: Optional[pd.Index] = None) -> dict:
+    """Compute the full transition analytics payload from the G1/G2/G3 frames.
+
+    course_ids optionally restricts the analysis (e.g. to courses that pass
+    the data quality filter).
+    """
+    joined = join_stage_frames(frames, course_ids)
+    deltas = metric_deltas(joined)
+
+    matrices = {
+        stage_pair_key(i, j): transition_matrix(joined, i, j)
+        for i, j in STAGE_PAIRS
+    }
+
+    latest = joined[f"cqs{STAGE_SUFFIXES[-1]}"]
+    first = joined[f"cqs{STAGE_SUFFIXES[0]}"]
+    improved = int((latest > first).sum())
+    degraded = int((latest < first).sum())
+    stable = int((latest == first).sum())
+
+    degrading = degrading_courses(joined, deltas)
+
+    return {
+        "stages": STAGES,
+        "labels": CQS_LABELS,
+        "total_courses": int(len(joined)),
+        "transition_matrices": matrices,
+        "overall": {
+            "improved": improved,
+            "degraded": degraded,
+            "stable": stable,
+            "degrading_any_stage": len(degrading),
+        },
+        "metric_deltas": summarize_deltas(deltas),
+        "degrading_courses": degrading,
+    }
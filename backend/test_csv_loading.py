@@ -6,7 +6,7 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from main import load_historical_data_from_csv
+from loaders import load_historical_data_from_csv
 
 if __name__ == "__main__":
     print("Testing CSV loading...")
@@ -7,7 +7,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from main import load_historical_data_from_csv
+    from loaders import load_historical_data_from_csv
     
     print("=" * 60)
     print("Testing Historical Data Loading")
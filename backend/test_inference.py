@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Test script for batch CQS inference (needs scikit-learn for the reference models)"""
+import sys
+import os
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import inference
+from inference import CQSModel, score_frame
+
+FEATURES = ["comments_total", "inactive_rate", "pos_count", "neg_count"]
+
+
+def make_data(n_rows=2000, n_classes=3, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, len(FEATURES)))
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1] - X[:, 2], np.linspace(-1, 1, n_classes - 1))
+    return pd.DataFrame(X, columns=FEATURES), y
+
+
+def export_and_load(estimator, scaler=None) -> CQSModel:
+    """Round-trip a fitted estimator through the JSON model file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.json")
+        inference.export_sklearn_model(estimator, FEATURES, path, scaler=scaler)
+        return inference.load_model(path)
+
+
+def assert_matches_sklearn(model, estimator, df, X):
+    proba = model.predict_proba(model.feature_matrix(df))
+    expected = estimator.predict_proba(X)
+    assert np.allclose(proba, expected, atol=1e-9), np.abs(proba - expected).max()
+
+    scored = score_frame(model, df, batch_size=300)
+    assert (scored["CQS_num_pred"].to_numpy() == estimator.predict(X)).all()
+    assert np.allclose(scored["CQS_confidence_pred"], expected.max(axis=1))
+
+
+def test_linear_matches_sklearn():
+    df, y = make_data()
+    scaler = StandardScaler().fit(df.to_numpy())
+    X = scaler.transform(df.to_numpy())
+    estimator = LogisticRegression(max_iter=1000).fit(X, y)
+    assert_matches_sklearn(export_and_load(estimator, scaler), estimator, df, X)
+
+
+def test_binary_linear_matches_sklearn():
+    """Binary LogisticRegression exports a single logit row for classes[1]"""
+    df, y = make_data(n_classes=2)
+    y = np.where(y == 1, 2, 0)
+    estimator = LogisticRegression(max_iter=1000).fit(df.to_numpy(), y)
+    assert estimator.coef_.shape == (1, len(FEATURES))
+    model = export_and_load(estimator)
+    assert_matches_sklearn(model, estimator, df, df.to_numpy())
+    assert set(score_frame(model, df)["CQS_label_pred"]) <= {"Needs Improvement", "Excellent"}
+
+
+def test_forest_matches_sklearn():
+    df, y = make_data()
+    estimator = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(df.to_numpy(), y)
+    assert_matches_sklearn(export_and_load(estimator), estimator, df, df.to_numpy())
+
+
+def test_tree_not_in_dfs_order():
+    """Children may have lower indices than their parents"""
+    # Root 0 splits x0 <= 0 into node 4 (leaf) and node 1; node 1 splits
+    # x1 <= 0 into node 3 (leaf) and node 2, which splits x0 <= 1 into leaves 6, 5
+    tree = {
+        "children_left": [4, 3, 6, -1, -1, -1, -1],
+        "children_right": [1, 2, 5, -1, -1, -1, -1],
+        "feature": [0, 1, 0, -2, -2, -2, -2],
+        "threshold": [0.0, 0.0, 1.0, -2.0, -2.0, -2.0, -2.0],
+        "value": [[1, 1, 1], [1, 1, 1], [1, 1, 1], [0, 1, 0], [1, 0, 0], [0, 0, 1], [0, 3, 1]],
+    }
+    model = CQSModel({"type": "tree_ensemble", "features": ["a", "b"], "trees": [tree]})
+    assert model.trees[0].depth == 3
+
+    df = pd.DataFrame({"a": [-1.0, 0.5, 2.0, 0.5], "b": [0.0, -1.0, 1.0, 1.0]})
+    codes, confidence = model.predict(df)
+    assert codes.tolist() == [0, 1, 2, 1], codes
+    assert np.allclose(confidence, [1.0, 1.0, 1.0, 0.75]), confidence
+
+
+def test_malformed_tree_raises():
+    base = {
+        "children_left": [1, -1, -1],
+        "children_right": [2, -1, -1],
+        "feature": [0, -2, -2],
+        "threshold": [0.0, -2.0, -2.0],
+        "value": [[1, 1, 1], [1, 0, 0], [0, 0, 1]],
+    }
+    bad_trees = [
+        {**base, "children_right": [5, -1, -1]},                # child out of range
+        {**base, "children_right": [1, -1, -1]},                # node 1 reachable twice
+        {**base, "children_left": [1, 0, -1], "feature": [0, 0, -2]},  # cycle back to the root
+        {**base, "threshold": [0.0, -2.0]},                     # ragged node arrays
+    ]
+    for tree in bad_trees:
+        try:
+            CQSModel({"type": "tree_ensemble", "features": ["a"], "trees": [tree]})
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted malformed tree {tree}")
+
+
+def test_mismatched_model_file_raises():
+    """Shape mismatches fail on load, so loaders fall back to the CSV predictions"""
+    linear = {"type": "linear", "features": ["a", "b"], "coef": [[1, 0], [0, 1], [1, 1]], "intercept": [0, 0, 0]}
+    tree = {"children_left": [-1], "children_right": [-1], "feature": [-2], "threshold": [-2.0], "value": [[1, 2, 3]]}
+    bad_specs = [
+        {**linear, "classes": [1, 2, 3]},
+        {**linear, "classes": [0, 0, 1]},
+        {**linear, "coef": [[1, 0], [0, 1]], "intercept": [0, 0]},
+        {**linear, "intercept": [0, 0]},
+        {**linear, "fill_values": [0.0]},
+        {**linear, "scaler": {"mean": [0.0, 0.0], "scale": [1.0]}},
+        {"type": "tree_ensemble", "features": ["a"], "classes": [0, 2], "trees": [tree]},
+    ]
+    for spec in bad_specs:
+        try:
+            CQSModel(spec)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted malformed model {spec}")
+
+
+if __name__ == "__main__":
+    test_linear_matches_sklearn()
+    test_binary_linear_matches_sklearn()
+    test_forest_matches_sklearn()
+    test_tree_not_in_dfs_order()
+    test_malformed_tree_raises()
+    test_mismatched_model_file_raises()
+    print("✅ Inference checks passed")
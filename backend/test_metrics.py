@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Test script for the /metrics endpoint"""
+import sys
+import os
+import subprocess
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_metrics_content_type():
+    """Prometheus rejects duplicate content-type parameters, e.g. two charsets"""
+    client = TestClient(main.app)
+    response = client.get("/metrics")
+    content_type = response.headers["content-type"]
+    
+    assert response.status_code == 200, response.status_code
+    assert content_type.startswith("text/plain; version=0.0.4"), content_type
+    assert content_type.count("charset=") == 1, content_type
+    assert "# TYPE mooc_http_request_duration_seconds histogram" in response.text
+
+
+
+# Runs with METRICS_MULTIPROC_DIR set: the parent and an exited child each count once
+MULTIPROC_SCRIPT = r"""
+import os
+import metrics
+metrics.CACHE_REQUESTS.inc(cache="test", result="hit")
+pid = os.fork()
+if pid == 0:
+    metrics.CACHE_REQUESTS.inc(cache="test", result="hit")
+    metrics._store.flush()
+    os._exit(0)
+os.waitpid(pid, 0)
+print(metrics.render())
+"""
+
+
+def test_metrics_aggregate_across_processes():
+    """Counters from exited workers stay in the total; gauges are per live pid"""
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, "METRICS_MULTIPROC_DIR": directory}
+        output = subprocess.run(
+            [sys.executable, "-c", MULTIPROC_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        
+        assert 'mooc_cache_requests_total{cache="test",result="hit"} 2.0' in output, output
+        assert output.count("process_resident_memory_bytes{pid=") == 1, output
+        # The exited child's file was folded into the archive
+        assert "archive.json" in os.listdir(directory), os.listdir(directory)
+
+
+if __name__ == "__main__":
+    test_metrics_content_type()
+    test_metrics_aggregate_across_processes()
+    print("✅ /metrics checks passed")
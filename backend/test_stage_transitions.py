@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test script for the stage-transition analytics on small synthetic frames"""
+import sys
+import os
+import warnings
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from stage_transitions import build_stage_transitions, cqs_codes
+
+
+def make_frames():
+    """Courses 1-4 appear in every stage; course 5 is missing from Phase 2"""
+    g1 = pd.DataFrame({
+        "course_id": [1, 2, 3, 4, 5],
+        "course_name": ["A", "B", "C", "D", "E"],
+        "CQS_label_pred": ["Excellent", "Acceptable", None, "Excellent", "Excellent"],
+        "CQS_num_pred": [2, 1, np.nan, 2, 2],
+        "comments_total": [10, 20, 30, 40, 50],
+    })
+    g2 = pd.DataFrame({
+        "course_id": [1, 2, 3, 4],
+        "CQS_label_pred": ["Acceptable", "Acceptable", "Excellent", None],
+        "CQS_num_pred": [1, 1, 2, np.nan],
+        "comments_total": [15, 20, 35, 40],
+    })
+    g3 = pd.DataFrame({
+        "course_id": [1, 2, 3, 4, 5],
+        "CQS_label_pred": ["Needs Improvement", "Excellent", "Needs Improvement", "Needs Improvement", "Excellent"],
+        "CQS_num_pred": [0, 2, 0, 0, 2],
+        "comments_total": [12, 25, 30, 41, 55],
+    })
+    return [g1, g2, g3]
+
+
+def test_cqs_codes_label_then_number():
+    df = pd.DataFrame({
+        "CQS_label_pred": [" Excellent ", "unknown", None, None, "Acceptable"],
+        "CQS_num_pred": [0, 1, 2, 7, np.nan],
+    })
+    codes = cqs_codes(df)
+    # Label wins; unknown/missing labels fall back to the number; bad numbers are NaN
+    assert codes.tolist()[:3] == [2.0, 1.0, 2.0], codes.tolist()
+    assert np.isnan(codes.iloc[3]), codes.tolist()
+    assert codes.iloc[4] == 1.0, codes.tolist()
+
+    assert cqs_codes(pd.DataFrame({"CQS_num_pred": ["2", "x"]})).tolist()[0] == 2.0
+
+
+def test_courses_missing_a_stage_are_dropped():
+    result = build_stage_transitions(make_frames())
+    assert result["total_courses"] == 4, result["total_courses"]
+    assert "5" not in [c["course_id"] for c in result["degrading_courses"]]
+
+    # Course 3 has no Phase 1 prediction, so only 3 courses count for Phase 1 -> Phase 3
+    matrix = np.array(result["transition_matrices"]["Phase 1 -> Phase 3"])
+    assert matrix.sum() == 3, matrix
+    assert matrix[2, 0] == 2 and matrix[1, 2] == 1, matrix
+
+    deltas = result["metric_deltas"]["comments_total"]["Phase 1 -> Phase 3"]
+    assert deltas["count"] == 4 and deltas["min"] == 0.0 and deltas["max"] == 5.0, deltas
+    # Missing metric columns give empty statistics, not errors
+    assert result["metric_deltas"]["pos_count"]["Phase 1 -> Phase 2"]["count"] == 0
+
+
+def test_degrading_courses_with_nan_stages():
+    result = build_stage_transitions(make_frames())
+    degrading = {c["course_id"]: c for c in result["degrading_courses"]}
+
+    # 1: 2 -> 1 -> 0; 3: NaN -> 2 -> 0. 4 has no Phase 2 label, so no consecutive drop
+    assert list(degrading) == ["3", "1"], list(degrading)
+    assert degrading["3"]["worst_step_drop"] == 2
+    assert degrading["3"]["overall_drop"] is None
+    assert degrading["3"]["predictions"]["Phase 1"] is None
+    assert degrading["1"]["overall_drop"] == 2.0
+    assert degrading["1"]["deltas"]["comments_total_delta_12"] == 5.0
+    assert degrading["1"]["course_name"] == "A"
+
+
+def test_empty_course_ids():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        result = build_stage_transitions(make_frames(), pd.Index([]))
+    assert result["total_courses"] == 0
+    assert result["degrading_courses"] == []
+    assert result["overall"] == {"improved": 0, "degraded": 0, "stable": 0, "degrading_any_stage": 0}
+    assert all(sum(map(sum, m)) == 0 for m in result["transition_matrices"].values())
+    assert result["metric_deltas"]["comments_total"]["Phase 1 -> Phase 2"]["median"] is None
+
+
+if __name__ == "__main__":
+    test_cqs_codes_label_then_number()
+    test_courses_missing_a_stage_are_dropped()
+    test_degrading_courses_with_nan_stages()
+    test_empty_course_ids()
+    print("✅ Stage transition checks passed")
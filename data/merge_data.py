@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Chunked ETL that builds the CSVs the backend loaders read
+
+Replaces merge_data.ipynb. Source tables are streamed in chunks and joined on
+course_id through a compact in-memory lookup holding only the columns we need
+(course.csv: id/name, course_score.csv: CQV/CQS) for the course ids we output.
+
+Outputs (written next to the sources unless --out-dir is given):
+    train_set_with_name_score.csv  train_set + course_name + CQV + CQS
+    historical_courses.csv         the above + learning_interaction_score
+    predicted/*.csv                predicted stage files + course_name (rewritten in place)
+
+Usage:
+    python merge_data.py --data-dir .
+    python merge_data.py --data-dir /path/to/raw --chunksize 50000
+    python merge_data.py benchmark --rows 1000000
+"""
+import argparse
+import glob
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Columns averaged into learning_interaction_score for historical_courses.csv
+LEARNING_INTERACTION_COLS = [
+    "assignment_coverage",
+    "video_coverage",
+    "discussion_coverage",
+    "n_users_content_interaction",
+    "correct_rate_course",
+    "progress_ratio",
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Progress:
+    """Prints rows processed, throughput and peak RSS after every chunk"""
+
+    def __init__(self, name: str, quiet: bool = False):
+        self.name = name
+        self.quiet = quiet
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def update(self, n: int):
+        self.rows += n
+        if not self.quiet:
+            elapsed = time.perf_counter() - self.start
+            rate = self.rows / elapsed if elapsed > 0 else 0.0
+            print(f"  [{self.name}] {self.rows:,} rows  {rate:,.0f} rows/s  peak RSS {peak_rss_mb():.0f} MB",
+                  flush=True)
+
+    def done(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        if not self.quiet:
+            print(f"  [{self.name}] done: {self.rows:,} rows in {elapsed:.2f}s", flush=True)
+        return elapsed
+
+
+def read_chunks(path: str, chunksize: int, **kwargs):
+    return pd.read_csv(path, chunksize=chunksize, low_memory=False, **kwargs)
+
+
+def collect_course_ids(paths, chunksize: int) -> set:
+    """Stream only the course_id column of each file and return the distinct ids"""
+    ids = set()
+    for path in paths:
+        for chunk in read_chunks(path, chunksize, usecols=["course_id"], dtype={"course_id": str}):
+            ids.update(chunk["course_id"].dropna().unique())
+    return ids
+
+
+def build_lookup(path: str, key: str, columns, wanted_ids: set, chunksize: int, quiet: bool = False) -> pd.DataFrame:
+    """Stream `path` keeping only `columns` for rows whose `key` is in wanted_ids.
+
+    Returns a frame indexed by course id. Memory is bounded by the number of
+    wanted ids, not by the size of the source table. First occurrence wins
+    for duplicated ids.
+    """
+    progress = Progress(os.path.basename(path), quiet)
+    parts = []
+    for chunk in read_chunks(path, chunksize, usecols=[key] + list(columns), dtype={key: str}):
+        progress.update(len(chunk))
+        parts.append(chunk[chunk[key].isin(wanted_ids)])
+    progress.done()
+
+    if parts:
+        lookup = pd.concat(parts, ignore_index=True)
+    else:
+        lookup = pd.DataFrame(columns=[key] + list(columns))
+    return lookup.drop_duplicates(key).set_index(key)
+
+
+def attach_lookup(chunk: pd.DataFrame, lookup: pd.DataFrame, columns) -> pd.DataFrame:
+    """Left-join lookup columns onto a chunk by course_id, replacing existing ones"""
+    chunk = chunk.drop(columns=[c for c in columns if c in chunk.columns])
+    joined = lookup[list(columns)].reindex(chunk["course_id"].astype(str))
+    for col in columns:
+        chunk[col] = joined[col].to_numpy()
+    return chunk
+
+
+def add_learning_interaction_score(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Row-wise mean of LEARNING_INTERACTION_COLS, skipping NaN"""
+    cols = [c for c in LEARNING_INTERACTION_COLS if c in chunk.columns]
+    chunk["learning_interaction_score"] = chunk[cols].mean(axis=1, skipna=True)
+    return chunk
+
+
+class ChunkWriter:
+    """Appends chunks to a CSV via a temp file, moved into place on close
+
+    Writing to a temp file lets us rewrite a file we are still reading from
+    (the predicted stage files) and never leaves a half-written output behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".csv.tmp")
+        self.file = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, chunk: pd.DataFrame):
+        chunk.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def merge_train_set(train_path: str, names: pd.DataFrame, scores: pd.DataFrame, out_dir: str,
+                    chunksize: int, quiet: bool = False):
+    """Write train_set_with_name_score.csv and historical_courses.csv in one pass over train_set.csv"""
+    named_writer = ChunkWriter(os.path.join(out_dir, "train_set_with_name_score.csv"))
+    historical_writer = ChunkWriter(os.path.join(out_dir, "historical_courses.csv"))
+    progress = Progress(os.path.basename(train_path), quiet)
+    try:
+        for chunk in read_chunks(train_path, chunksize, dtype={"course_id": str}):
+            chunk = attach_lookup(chunk, names, ["course_name"])
+            chunk = attach_lookup(chunk, scores, ["CQV", "CQS"])
+            named_writer.write(chunk)
+            historical_writer.write(add_learning_interaction_score(chunk))
+            progress.update(len(chunk))
+    except BaseException:
+        named_writer.abort()
+        historical_writer.abort()
+        raise
+    named_writer.close()
+    historical_writer.close()
+    return progress.done(), progress.rows
+
+
+def merge_predicted(paths, names: pd.DataFrame, out_dir: str, chunksize: int, quiet: bool = False):
+    """Add course_name to each predicted stage file"""
+    total_rows = 0
+    total_elapsed = 0.0
+    for path in paths:
+        writer = ChunkWriter(os.path.join(out_dir, "predicted", os.path.basename(path)))
+        progress = Progress(os.path.basename(path), quiet)
+        try:
+            for chunk in read_chunks(path, chunksize, dtype={"course_id": str}):
+                writer.write(attach_lookup(chunk, names, ["course_name"]))
+                progress.update(len(chunk))
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        total_elapsed += progress.done()
+        total_rows += progress.rows
+    return total_elapsed, total_rows
+
+
+def run(data_dir: str, out_dir: str = None, chunksize: int = DEFAULT_CHUNKSIZE, quiet: bool = False) -> dict:
+    """Run the full ETL. Returns timing and row counts."""
+    out_dir = out_dir or data_dir
+    os.makedirs(os.path.join(out_dir, "predicted"), exist_ok=True)
+
+    course_path = os.path.join(data_dir, "course.csv")
+    score_path = os.path.join(data_dir, "course_score.csv")
+    train_path = os.path.join(data_dir, "train_set.csv")
+    predicted_paths = sorted(glob.glob(os.path.join(data_dir, "predicted", "*.csv")))
+
+    missing = [p for p in [course_path, score_path, train_path] if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"Source files not found: {missing}")
+
+    start = time.perf_counter()
+
+    if not quiet:
+        print("Collecting course ids...")
+    wanted_ids = collect_course_ids([train_path] + predicted_paths, chunksize)
+    if not quiet:
+        print(f"  {len(wanted_ids):,} distinct course ids")
+        print("Building lookups...")
+    names = build_lookup(course_path, "id", ["name"], wanted_ids, chunksize, quiet)
+    names = names.rename(columns={"name": "course_name"})
+    scores = build_lookup(score_path, "course_id", ["CQV", "CQS"], wanted_ids, chunksize, quiet)
+
+    if not quiet:
+        print("Writing train set outputs...")
+    _, train_rows = merge_train_set(train_path, names, scores, out_dir, chunksize, quiet)
+
+    if not quiet:
+        print("Writing predicted stage files...")
+    _, predicted_rows = merge_predicted(predicted_paths, names, out_dir, chunksize, quiet)
+
+    elapsed = time.perf_counter() - start
+    rows = train_rows + predicted_rows
+    stats = {
+        "train_rows": train_rows,
+        "predicted_rows": predicted_rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if not quiet:
+        print(f"Done in {elapsed:.2f}s ({stats['rows_per_second']:,.0f} rows/s, peak RSS {stats['peak_rss_mb']:.0f} MB)")
+    return stats
+
+
+def write_synthetic_sources(data_dir: str, rows: int, chunksize: int, seed: int = 42):
+    """Generate course.csv, course_score.csv, train_set.csv and one predicted file of `rows` courses.
+
+    course.csv gets 3x as many rows as the train set so the lookup filter has
+    something to discard. Written in chunks so generation stays bounded too.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(data_dir, "predicted"), exist_ok=True)
+    train_cols = ["neg_count", "pos_count", "comments_total", "enrollment_count", "inactive_rate"] \
+        + LEARNING_INTERACTION_COLS
+
+    def ids(start, n):
+        return np.char.add("C_", np.arange(start, start + n).astype(str))
+
+    targets = {
+        "course.csv": rows * 3,
+        "course_score.csv": rows,
+        "train_set.csv": rows,
+        os.path.join("predicted", "course_engagement_by_course_G1_with_predictions.csv"): rows,
+    }
+    for name, total in targets.items():
+        path = os.path.join(data_dir, name)
+        for start in range(0, total, chunksize):
+            n = min(chunksize, total - start)
+            if name == "course.csv":
+                chunk = pd.DataFrame({"id": ids(start, n), "name": np.char.add("Course ", np.arange(start, start + n).astype(str))})
+            elif name == "course_score.csv":
+                chunk = pd.DataFrame({"course_id": ids(start, n), "CQV": rng.random(n),
+                                      "CQS": rng.choice(["Needs Improvement", "Acceptable", "Excellent"], n)})
+            else:
+                chunk = pd.DataFrame(rng.random((n, len(train_cols))), columns=train_cols)
+                chunk.insert(0, "course_id", ids(start, n))
+            chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def benchmark(rows: int, chunksize: int):
+    """Measure end-to-end ETL throughput on synthetic data of `rows` courses"""
+    tmp = tempfile.mkdtemp(prefix="merge_data_bench_")
+    try:
+        print(f"Generating {rows:,} synthetic courses in {tmp}...")
+        write_synthetic_sources(tmp, rows, chunksize)
+        stats = run(tmp, chunksize=chunksize, quiet=True)
+        total = stats["train_rows"] + stats["predicted_rows"]
+        print(f"chunksize={chunksize:,}  rows={total:,}  time={stats['seconds']:.2f}s  "
+              f"throughput={stats['rows_per_second']:,.0f} rows/s  peak RSS={stats['peak_rss_mb']:.0f} MB")
+        return stats
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "benchmark"])
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="directory holding course.csv, course_score.csv, train_set.csv and predicted/")
+    parser.add_argument("--out-dir", default=None, help="output directory (default: --data-dir)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic courses for benchmark")
+    parser.add_argument("--quiet", action="store_true", help="suppress per-chunk progress")
+    args = parser.parse_args(argv)
+
+    if args.command == "benchmark":
+        benchmark(args.rows, args.chunksize)
+    else:
+        run(args.data_dir, args.out_dir, args.chunksize, args.quiet)
+
+
+if __name__ == "__main__":
+    main()